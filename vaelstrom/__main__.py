@@ -1,16 +1,20 @@
 import sys
 import logging
+import multiprocessing
 
 from vaelstrom.install_manager import InstallManager
-from vaelstrom.gui_qt import run_qt_app, ListenerRunnable
+from vaelstrom.gui_qt import run_qt_app, UrlListener
 
 VALHEIM_DIR = None
 # VALHEIM_DIR = Path("test_installation")
 
+# child processes of a frozen build must stop here instead of starting the app
+multiprocessing.freeze_support()
+
 if len(sys.argv) > 1:
     # url protocol handler path
     # get url from first arg and use IPC to send it to main app, then exit
-    ListenerRunnable.send(sys.argv[1])
+    UrlListener.send(sys.argv[1])
     sys.exit()
 
 # logger = logging.getLogger("vaelstrom")
@@ -1,56 +1,113 @@
+import mmap
+import os
 import re
 
+# numba is optional, without it the kernel below simply runs as python
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+    njit = None
+
+# marker followed by a plausible length byte and the first two chars of a package
+# name. the shortest valid package name ("a.b") is three chars long.
+# the more selective this is, the fewer candidates need to be parsed in python
+CANDIDATE_REGEX = re.compile(rb"\x01\x00(?=[\x03-\x7f][a-zA-Z_][a-zA-Z0-9_.])")
+# used with match(data, start, end), which anchors at start by itself
+PACKAGE_REGEX = re.compile(rb"([a-zA-Z_][a-zA-Z0-9_]*)(\.([a-zA-Z_][a-zA-Z0-9_]*))+$")
+VERSION_REGEX = re.compile(rb"[0-9]+(\.[0-9]+)*$")
+
+
+def _parse_three_pstrings(buf, index):
+    """look for exactly three consecutive length-prefixed strings at index.
+    returns (ok, a, b, c) where a, b, c are the offsets of the length bytes"""
+    size = len(buf)
+    count = 0
+    a = 0
+    b = 0
+    c = 0
+    while index < size:
+        length = buf[index]
+        # offset of the last byte of this string
+        end = index + length
+        if length == 0 or length >= 128 or end > size:
+            return count == 3, a, b, c
+        if count == 3:
+            # a fourth string, no match
+            break
+        if count == 0:
+            a = index
+        elif count == 1:
+            b = index
+        else:
+            c = index
+        count += 1
+        index = end + 1
+    # ran past the end of the data
+    return False, a, b, c
+
+
+if njit is not None:
+    _parse_three_pstrings = njit(cache=True)(_parse_three_pstrings)
+
+
+def read_strings(file_bytes: memoryview, buf, index: int):
+    """find the three length-prefixed strings starting at index.
+    returns their (start, end) offsets in file_bytes, or an empty list if
+    there are not exactly three.
+    buf is the same data as file_bytes, as a numpy array if numba is available"""
+    ok, a, b, c = _parse_three_pstrings(buf, index)
+    if not ok:
+        return []
+    return [(i + 1, i + 1 + file_bytes[i]) for i in (a, b, c)]
 
-def read_strings(file_bytes: bytes, index: int):
-    result: list = []
 
-    length: int = 0
+def find_plugin_info(dll_path: str):
+    with open(dll_path, "rb") as f:
+        # mmap refuses to map empty files
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as file_bytes:
+            with memoryview(file_bytes) as mv:
+                matching_strings = _find_matching_strings(file_bytes, mv)
 
-    try:
-        while (
-            (length := file_bytes[index]) != 0
-            and length < 128
-            and index + length <= len(file_bytes)
-        ):
-            result.append(file_bytes[index + 1 : index + 1 + length].decode("utf-8"))
-            index += length + 1
-    except:
-        return []
+    if len(matching_strings) != 1:
+        return None
 
-    return result
+    return {
+        "package": matching_strings[0][0],
+        "title": matching_strings[0][1],
+        "version": matching_strings[0][2],
+    }
 
 
-def find_plugin_info(dll_path: str):
+def _find_matching_strings(file_bytes: mmap.mmap, mv: memoryview):
     matching_strings: list = []
 
-    package_regex = r"^([a-zA-Z_][a-zA-Z0-9_]*)(\.([a-zA-Z_][a-zA-Z0-9_]*))+$"
-    version_regex = r"^[0-9]+(\.[0-9]+)*$"
-
-    with open(dll_path, "rb") as f:
-        file_bytes: bytes = f.read()
-
-        for i in range(len(file_bytes) - 2):
-            if file_bytes[i] != 1 or file_bytes[i + 1] != 0:
-                continue
+    buf = mv if np is None else np.frombuffer(mv, dtype=np.uint8)
 
-            strings: list = read_strings(file_bytes, i + 2)
+    # a single regex scan finds all candidate offsets,
+    # only those get parsed and validated in python
+    for m in CANDIDATE_REGEX.finditer(file_bytes):
+        spans: list = read_strings(mv, buf, m.end())
 
-            if len(strings) != 3:
-                continue
+        if len(spans) != 3:
+            continue
 
-            if not re.match(package_regex, strings[0]):
-                continue
+        # match within the data, no need to slice anything for rejects
+        if not PACKAGE_REGEX.match(mv, *spans[0]):
+            continue
 
-            if not re.match(version_regex, strings[2]):
-                continue
+        if not VERSION_REGEX.match(mv, *spans[2]):
+            continue
 
-            matching_strings.append(strings)
+        try:
+            # only decode survivors, package and version are ascii at this point
+            strings = [str(mv[start:end], "utf-8") for (start, end) in spans]
+        except UnicodeDecodeError:
+            continue
 
-    if len(matching_strings) != 1:
-        return None
+        matching_strings.append(strings)
 
-    return {
-        "package": matching_strings[0][0],
-        "title": matching_strings[0][1],
-        "version": matching_strings[0][2],
-    }
+    return matching_strings
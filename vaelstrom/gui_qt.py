@@ -2,23 +2,24 @@
 
 import time
 import logging
-from multiprocessing.connection import Listener
-from multiprocessing.connection import Client
+import struct
 from typing import Optional, Callable
 
 from PySide2.QtGui import QColor
 from PySide2.QtCore import (
+    QCoreApplication,
     QThreadPool,
     QObject,
     QSize,
     Qt,
     QAbstractTableModel,
-    QSortFilterProxyModel,
     Slot,
     Signal,
     QModelIndex,
     QRunnable,
+    QTimer,
 )
+from PySide2.QtNetwork import QLocalServer, QLocalSocket
 from PySide2.QtWidgets import (
     QApplication,
     QLabel,
@@ -34,8 +35,8 @@ from PySide2.QtWidgets import (
     QTableView,
 )
 
-from vaelstrom.install_manager import InstallManager
-from vaelstrom.util import pretty_date, ts_to_text
+from vaelstrom.install_manager import InstallManager, VersionStatus
+from vaelstrom.util import PRETTY_DATE_RESOLUTION, now_ts, pretty_date, ts_to_text
 
 
 class QHLine(QFrame):
@@ -60,74 +61,152 @@ class ModTableModel(QAbstractTableModel):
     COL_TS_AVAIL = 4
     COL_MAX = 5
 
+    # indexed by the COL_* constants above
+    HEADER_TITLES = (
+        "Title",
+        "Installed",
+        "Available",
+        "Age (Installed)",
+        "Age (Available)",
+    )
+    HEADER_TOOLTIPS = (
+        "Title of the mod",
+        "Installed version of the mod",
+        "The newest available version of this mod",
+        "The date when the installed version was released",
+        "The date when the newest available version was released",
+    )
+
+    # background colors by (version status, disabled)
+    BACKGROUND_COLORS = {
+        (VersionStatus.NewerAvailable, False): QColor.fromHsv(350, 102, 255),  # red
+        (VersionStatus.NewerAvailable, True): QColor.fromHsv(350, 51, 127),
+        (VersionStatus.InstalledIsNewer, False): QColor.fromHsv(46, 153, 255),  # yellow
+        (VersionStatus.InstalledIsNewer, True): QColor.fromHsv(46, 76, 127),
+        (VersionStatus.Newest, False): QColor.fromHsv(100, 153, 255),  # green
+        (VersionStatus.Newest, True): QColor.fromHsv(100, 76, 127),
+        (VersionStatus.Unknown, False): QColor.fromHsv(0, 0, 255),
+        (VersionStatus.Unknown, True): QColor.fromHsv(0, 0, 127),
+    }
+
+    # tooltips of the version columns by version status
+    VERSION_TOOLTIPS = {
+        VersionStatus.NewerAvailable: "Newer version available, consider updating.",
+        VersionStatus.InstalledIsNewer: (
+            "Your installed version is newer than what is available online."
+            " Forcing update with Vaelstrom will downgrade."
+        ),
+        VersionStatus.Newest: "You currently have the newest available version.",
+        VersionStatus.Unknown: "To find out whether a newer version is available, check for updates.",
+    }
+
     def __init__(self, man: InstallManager):
         super().__init__()
         self._man = man
+        # formatted timestamps, keyed by timestamp.
+        # relative dates go stale, so they are dropped whenever the model is reset
+        # and whenever the dates are refreshed
+        self._pretty_dates = {}
+        self._ts_texts = {}
+        # all relative dates are relative to this time, until the next refresh
+        self._now = now_ts()
+        self._resetting = False
+        self.modelAboutToBeReset.connect(self._on_about_to_reset)
+        self.modelReset.connect(self._on_reset)
+        # ages move on while the window is open
+        self._date_timer = QTimer(self)
+        self._date_timer.timeout.connect(self.refresh_dates)
+        self._date_timer.start(PRETTY_DATE_RESOLUTION * 1000)
+
+        # functions returning the data of a mod item, by role and column
+        def available_version(item):
+            return item.available_version or "unknown"
+
+        def version_tooltip(item):
+            return __class__.VERSION_TOOLTIPS[item.status]
+
+        def background(item):
+            return __class__.BACKGROUND_COLORS[(item.status, item.disabled)]
+
+        display = {
+            __class__.COL_NAME: lambda item: item.state.title,
+            __class__.COL_VERSION: lambda item: item.state.version,
+            __class__.COL_TS_INSTALLED: lambda item: self._pretty_date(item.state.ts),
+            __class__.COL_VERSION_AVAIL: available_version,
+            __class__.COL_TS_AVAIL: lambda item: self._pretty_date(item.available_ts),
+        }
+        tooltip = {
+            __class__.COL_TS_INSTALLED: lambda item: self._ts_to_text(item.state.ts),
+            __class__.COL_TS_AVAIL: lambda item: self._ts_to_text(item.available_ts),
+            __class__.COL_VERSION: version_tooltip,
+            __class__.COL_VERSION_AVAIL: version_tooltip,
+        }
+        self._getters = {
+            int(Qt.DisplayRole): display,
+            int(Qt.ToolTipRole): tooltip,
+            int(Qt.BackgroundRole): dict.fromkeys(range(__class__.COL_MAX), background),
+        }
+
+    def _on_about_to_reset(self):
+        self._resetting = True
+
+    def _on_reset(self):
+        self._resetting = False
+        self.clear_date_cache()
+
+    def clear_date_cache(self):
+        self._pretty_dates.clear()
+        self._ts_texts.clear()
+        self._now = now_ts()
+
+    @Slot()
+    def refresh_dates(self):
+        """format the relative dates against the current time again"""
+        if self._resetting:
+            # the end of the reset refreshes them anyway
+            return
+        self._pretty_dates.clear()
+        self._now = now_ts()
+        rows = self.rowCount(QModelIndex())
+        if rows > 0:
+            self.dataChanged.emit(
+                self.index(0, __class__.COL_TS_INSTALLED),
+                self.index(rows - 1, __class__.COL_TS_AVAIL),
+                [Qt.DisplayRole],
+            )
+
+    def _pretty_date(self, timestamp):
+        if (text := self._pretty_dates.get(timestamp)) is None:
+            now = self._now
+            if timestamp is not None and now < timestamp < now + PRETTY_DATE_RESOLUTION:
+                # released since the last refresh, so it is at most this old
+                now = timestamp
+            text = self._pretty_dates[timestamp] = pretty_date(timestamp, now)
+        return text
+
+    def _ts_to_text(self, timestamp):
+        if (text := self._ts_texts.get(timestamp)) is None:
+            text = self._ts_texts[timestamp] = ts_to_text(timestamp)
+        return text
 
     def get_mod_item(self, index: QModelIndex):
         return self._man.installed_mods[index.row()]
 
     def data(self, index: QModelIndex, role):
-        item = self.get_mod_item(index)
-        if role == Qt.DisplayRole:
-            if index.column() == __class__.COL_NAME:
-                return item.state.title
-            elif index.column() == __class__.COL_VERSION:
-                return item.state.version
-            elif index.column() == __class__.COL_TS_INSTALLED:
-                return pretty_date(item.state.ts)
-            elif index.column() == __class__.COL_VERSION_AVAIL:
-                return item.available_version or "unknown"
-            elif index.column() == __class__.COL_TS_AVAIL:
-                return pretty_date(item.available_ts)
-        elif role == Qt.ToolTipRole:
-            if index.column() == __class__.COL_TS_INSTALLED:
-                return ts_to_text(item.state.ts)
-            elif index.column() == __class__.COL_TS_AVAIL:
-                return ts_to_text(item.available_ts)
-            elif index.column() in (__class__.COL_VERSION, __class__.COL_VERSION_AVAIL):
-                if item.available_ts is not None:
-                    if item.available_ts > item.state.ts:
-                        return "Newer version available, consider updating."
-                    elif item.available_ts < item.state.ts:
-                        return (
-                            "Your installed version is newer than what is available online."
-                            " Forcing update with Vaelstrom will downgrade."
-                        )
-                    else:
-                        return "You currently have the newest available version."
-                else:
-                    return "To find out whether a newer version is available, check for updates."
-        elif role == Qt.BackgroundRole:
-            factor = 0.5 if item.disabled else 1
-            if item.available_ts is not None:
-                if item.available_ts > item.state.ts:
-                    return QColor.fromHsv(350, 102 * factor, 255 * factor)  # red
-                elif item.available_ts < item.state.ts:
-                    return QColor.fromHsv(46, 153 * factor, 255 * factor)  # yellow
-                else:
-                    return QColor.fromHsv(100, 153 * factor, 255 * factor)  # green
-            else:
-                return QColor.fromHsv(0, 0, factor * 255)
+        getters = self._getters.get(role)
+        if getters is None:
+            return None
+        getter = getters.get(index.column())
+        if getter is None:
+            return None
+        return getter(self.get_mod_item(index))
 
     def headerData(self, section, orientation: Qt.Orientation, role):
         if orientation == Qt.Horizontal:
             if role == Qt.DisplayRole:
-                return {
-                    __class__.COL_NAME: "Title",
-                    __class__.COL_VERSION: "Installed",
-                    __class__.COL_TS_INSTALLED: "Age (Installed)",
-                    __class__.COL_VERSION_AVAIL: "Available",
-                    __class__.COL_TS_AVAIL: "Age (Available)",
-                }[section]
+                return __class__.HEADER_TITLES[section]
             elif role == Qt.ToolTipRole:
-                return {
-                    __class__.COL_NAME: "Title of the mod",
-                    __class__.COL_VERSION: "Installed version of the mod",
-                    __class__.COL_TS_INSTALLED: "The date when the installed version was released",
-                    __class__.COL_VERSION_AVAIL: "The newest available version of this mod",
-                    __class__.COL_TS_AVAIL: "The date when the newest available version was released",
-                }[section]
+                return __class__.HEADER_TOOLTIPS[section]
 
     def rowCount(self, index):
         return len(self._man.installed_mods)
@@ -143,11 +222,11 @@ class ModTableView(QTableView):
 
         # set up the model directly
         self.mod_model = ModTableModel(self._man)
-        # proxy model is helpful for sorting rows independently of the actual model
-        model_proxy = QSortFilterProxyModel()
-        model_proxy.setSourceModel(self.mod_model)
         self.setSizeAdjustPolicy(QTableView.SizeAdjustPolicy.AdjustToContents)
-        self.setModel(model_proxy)
+        # no proxy model as long as there is no sorting or filtering.
+        # to enable sorting, put a QSortFilterProxyModel in between
+        # and map the selected rows in get_selected_mods back to the source
+        self.setModel(self.mod_model)
         self.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
         # self.table.setSortingEnabled(True)
         self.resizeColumnsToContents()
@@ -161,6 +240,11 @@ class ModTableView(QTableView):
 
 
 class MainWindow(QMainWindow):
+    IDLE_DELAY_MS = 50
+    # workers are mostly waiting on the network,
+    # more concurrent requests than this just compete for bandwidth
+    MAX_WORKER_THREADS = 6
+
     def __init__(self, man: InstallManager):
         super().__init__()
         self.man = man
@@ -199,16 +283,39 @@ class MainWindow(QMainWindow):
         self.container.setLayout(layout)
         self.setCentralWidget(self.container)
 
-        self.pool = QThreadPool()
-        worker = ListenerRunnable()
-        worker.signals.url_received.connect(self.on_url_received)
-        self.pool.start(worker)
+        self.pool = QThreadPool.globalInstance()
+        self.pool.setMaxThreadCount(__class__.MAX_WORKER_THREADS)
+        self.listener = UrlListener(self)
+        self.listener.url_received.connect(self.on_url_received)
         self.workers_currently_working = 0
+        # whether the ui currently shows the working state,
+        # lags behind the worker counter by IDLE_DELAY_MS when going idle
+        self.ui_working = False
+        # whether the model is being reset, i.e. mods may be added or removed
+        self.model_resetting = False
+        # mods changed by data-only workers, their rows are refreshed when idle
+        self.changed_mods = []
         self.run_on_threadpool(self.man.find_installed_mods)
 
     def run_on_threadpool(self, function, *args, **kwargs):
-        if self.workers_currently_working == 0:
+        """run function in a worker. resets the model once all workers are done,
+        use this if the function may add or remove mods"""
+        if not self.ui_working:
+            self.set_working()
+        if not self.model_resetting:
+            self.model_resetting = True
+            self.table.mod_model.beginResetModel()
+        self._start_worker(function, *args, **kwargs)
+
+    def run_on_threadpool_data_only(self, mods, function, *args, **kwargs):
+        """run function in a worker. the function must only change the data
+        of the given mods, their rows are refreshed once all workers are done"""
+        if not self.ui_working:
             self.set_working()
+        self.changed_mods.extend(mods)
+        self._start_worker(function, *args, **kwargs)
+
+    def _start_worker(self, function, *args, **kwargs):
         self.workers_currently_working += 1
         worker = FuncWorker(function, *args, **kwargs)
         worker.signals.done.connect(self.on_worker_done)
@@ -221,19 +328,42 @@ class MainWindow(QMainWindow):
         else:
             self.workers_currently_working -= 1
         if self.workers_currently_working == 0:
-            self.set_idle()
+            # wait a moment in case more workers are started right away,
+            # so that a burst of workers only resizes the table once
+            QTimer.singleShot(__class__.IDLE_DELAY_MS, self._maybe_set_idle)
         if failed:
             logging.error("A worker task has failed")
 
+    def _maybe_set_idle(self):
+        if self.ui_working and self.workers_currently_working == 0:
+            self.set_idle()
+
     def set_working(self):
         logging.debug("First worker starting")
+        self.ui_working = True
         for i in range(self.buttons.count()):
             self.buttons.itemAt(i).widget().setEnabled(False)
-        self.table.mod_model.beginResetModel()
 
     def set_idle(self):
         logging.debug("Last worker finished")
-        self.table.mod_model.endResetModel()
+        self.ui_working = False
+        model = self.table.mod_model
+        if self.model_resetting:
+            self.model_resetting = False
+            model.endResetModel()
+        else:
+            # the reset clears them otherwise, relative dates go stale
+            model.clear_date_cache()
+            changed = {id(mod) for mod in self.changed_mods}
+            roles = [Qt.DisplayRole, Qt.ToolTipRole, Qt.BackgroundRole]
+            for row, mod in enumerate(self.man.installed_mods):
+                if id(mod) in changed:
+                    model.dataChanged.emit(
+                        model.index(row, 0),
+                        model.index(row, model.COL_MAX - 1),
+                        roles,
+                    )
+        self.changed_mods.clear()
         self.table.resizeColumnsToContents()
         self.container.adjustSize()
         self.adjustSize()
@@ -241,7 +371,7 @@ class MainWindow(QMainWindow):
             self.buttons.itemAt(i).widget().setEnabled(True)
 
     def is_working(self):
-        return self.workers_currently_working > 0
+        return self.ui_working
 
     def test_clicked(self):
         self.run_on_threadpool(self.timer_test, 3, False)
@@ -286,8 +416,10 @@ class MainWindow(QMainWindow):
             self.run_on_threadpool(self.man.update_mod, mod, force)
 
     def update_all(self, force=False):
-        for mod in self.man.installed_mods:
-            self.run_on_threadpool(self.man.update_mod, mod, force)
+        # a single worker for all mods, it checks them all at once
+        # and downloads the updates concurrently
+        mods = list(self.man.installed_mods)
+        self.run_on_threadpool(self.man.update_mods, mods, force)
 
     def uninstall_selected(self):
         mods = self.table.get_selected_mods()
@@ -295,23 +427,22 @@ class MainWindow(QMainWindow):
             self.run_on_threadpool(self.man.uninstall_mod, mod.state.mod_key(), mod)
 
     def check_all(self):
-        # TODO: in case any request fails, we currently ignore all of the results
-        # maybe better to have a for-each like the functions above
-        self.run_on_threadpool(self.man.check_for_updates)
+        mods = list(self.man.installed_mods)
+        self.run_on_threadpool_data_only(mods, self.man.check_for_updates, mods)
 
     def check_selected(self):
         mods = self.table.get_selected_mods()
-        self.run_on_threadpool(self.man.check_for_updates, mods)
+        self.run_on_threadpool_data_only(mods, self.man.check_for_updates, mods)
 
     def enable_selected(self):
         mods = self.table.get_selected_mods()
         for mod in mods:
-            self.run_on_threadpool(self.man.enable_mod, mod)
+            self.run_on_threadpool_data_only([mod], self.man.enable_mod, mod)
 
     def disable_selected(self):
         mods = self.table.get_selected_mods()
         for mod in mods:
-            self.run_on_threadpool(self.man.disable_mod, mod)
+            self.run_on_threadpool_data_only([mod], self.man.disable_mod, mod)
 
     @Slot(str)
     def on_url_received(self, url: str):
@@ -336,39 +467,80 @@ class MainWindow(QMainWindow):
             raise Exception("timer_test raising exception")
 
 
-class ListenerSignals(QObject):
-    url_received = Signal(str)
+class UrlListener(QObject):
+    """receives urls from the url protocol handler over a local socket
+    (a named pipe on windows). messages are utf-16-le encoded and
+    prefixed with their length as a big-endian 4 byte field"""
 
+    SERVER_NAME = "vaelstrom-ipc"
+    TIMEOUT_MS = 3000
 
-class ListenerRunnable(QRunnable):
-    def __init__(self):
-        super().__init__()
-        self.signals = ListenerSignals()
+    url_received = Signal(str)
 
-    def run(self):
-        listener = Listener(("localhost", 58238))
-        while True:
-            with listener.accept() as conn:
-                logging.debug(
-                    f"Listener: connection accepted from {listener.last_accepted}"
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.on_new_connection)
+        # on windows, listen also succeeds if another instance is listening already
+        if __class__._server_answers():
+            logging.error("Listener: another instance is already receiving urls")
+            return
+        if not self.server.listen(__class__.SERVER_NAME):
+            # nobody answered, so a crashed instance left its socket file behind (unix)
+            QLocalServer.removeServer(__class__.SERVER_NAME)
+            if not self.server.listen(__class__.SERVER_NAME):
+                logging.error(
+                    f"Listener: could not listen: {self.server.errorString()}"
                 )
-                msg = conn.recv_bytes().decode("utf-16-le")
-                if msg == "stop":
-                    break
-                logging.debug(f"Listener: Signalling URL: {msg}")
-                self.signals.url_received.emit(msg)
-        logging.debug("Listener: shut down.")
 
     @staticmethod
-    def send(msg: str):
-        conn = Client(("localhost", 58238))
-        conn.send_bytes(msg.encode("utf-16-le"))
-        conn.close()
+    def _server_answers() -> bool:
+        """whether a listener of another instance accepts connections"""
+        conn = QLocalSocket()
+        conn.connectToServer(__class__.SERVER_NAME)
+        if not conn.waitForConnected(__class__.TIMEOUT_MS):
+            return False
+        conn.disconnectFromServer()
+        return True
+
+    @Slot()
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            conn = self.server.nextPendingConnection()
+            logging.debug("Listener: connection accepted")
+            buffer = bytearray()
+            conn.readyRead.connect(lambda c=conn, b=buffer: self._read(c, b))
+            conn.disconnected.connect(conn.deleteLater)
+            if conn.bytesAvailable():
+                self._read(conn, buffer)
+
+    def _read(self, conn: QLocalSocket, buffer: bytearray):
+        buffer += conn.readAll().data()
+        if len(buffer) < 4:
+            return
+        (length,) = struct.unpack(">I", buffer[:4])
+        if len(buffer) < 4 + length:
+            return
+        msg = bytes(buffer[4 : 4 + length]).decode("utf-16-le")
+        del buffer[:]
+        logging.debug(f"Listener: Signalling URL: {msg}")
+        self.url_received.emit(msg)
+        conn.disconnectFromServer()
 
     @staticmethod
-    def stop():
-        # TODO: check if still running first
-        ListenerRunnable.send("stop")
+    def send(msg: str):
+        # blocking socket calls need an application instance, but no event loop
+        app = QCoreApplication.instance() or QCoreApplication([])
+        conn = QLocalSocket()
+        conn.connectToServer(__class__.SERVER_NAME)
+        if not conn.waitForConnected(__class__.TIMEOUT_MS):
+            raise ConnectionError(f"Could not connect: {conn.errorString()}")
+        data = msg.encode("utf-16-le")
+        conn.write(struct.pack(">I", len(data)) + data)
+        conn.waitForBytesWritten(__class__.TIMEOUT_MS)
+        conn.disconnectFromServer()
+        if conn.state() != QLocalSocket.UnconnectedState:
+            conn.waitForDisconnected(__class__.TIMEOUT_MS)
 
 
 class FuncWorkerSignals(QObject):
@@ -399,8 +571,4 @@ def run_qt_app(man: InstallManager):
     app = QApplication([])
     window = MainWindow(man)
     window.show()
-    try:
-        exitcode = app.exec_()
-    finally:
-        ListenerRunnable.stop()
-    return exitcode
+    return app.exec_()
@@ -1,10 +1,11 @@
 from enum import Enum, auto
 from pathlib import Path
-from dataclasses import dataclass
-import json
+from dataclasses import dataclass, field
+import os
 import re
 import shutil
-from typing import List, Optional, Set, Tuple
+import sys
+from typing import BinaryIO, List, Optional, Set, Tuple
 import zipfile as zf
 import tempfile
 import httpx
@@ -12,21 +13,26 @@ from urllib.parse import ParseResult, parse_qsl, urlparse
 import logging
 import webbrowser
 import asyncio
+from concurrent.futures import ProcessPoolExecutor
 
-import marshmallow_dataclass as mmd
+import orjson
 
 from vaelstrom import cfg
 import vaelstrom.nexusmods as nm
 import vaelstrom.thunderstore as ths
-from vaelstrom.marshmallow_ext import BaseSchema, SetEncoder
 from vaelstrom.find_plugin_info import find_plugin_info
 from vaelstrom.util import (
     find_steam_install_path,
+    local_date_ts_to_utc,
     pretty_date,
     thunderstore_date_to_ts,
     ts_to_text,
 )
 
+# instances without __dict__ are smaller and faster to access.
+# slots need python 3.10, older versions simply keep the __dict__
+_slots = {"slots": True} if sys.version_info >= (3, 10) else {}
+
 
 class ModType(Enum):
     Invalid = auto()
@@ -34,12 +40,27 @@ class ModType(Enum):
     Thunderstore = auto()
 
 
-@dataclass(frozen=True)
+class VersionStatus(Enum):
+    """how the available version compares to the installed one"""
+
+    Unknown = auto()
+    NewerAvailable = auto()
+    InstalledIsNewer = auto()
+    Newest = auto()
+
+
+@dataclass(frozen=True, **_slots)
 class ModKey:
     type: ModType
     nxm_id: int = 0
     ths_namespace: str = None  # type:ignore
     ths_name: str = None  # type:ignore
+    # keys are hashed all the time, but never change
+    _hash: int = field(init=False, repr=False, compare=False, default=0)
+
+    def __post_init__(self):
+        # frozen, so the usual assignment is not allowed
+        object.__setattr__(self, "_hash", hash(repr(self)))
 
     def __repr__(self):
         if self.type == ModType.NexusMod:
@@ -48,7 +69,29 @@ class ModKey:
             return f"ths-{self.ths_namespace}-{self.ths_name}"
 
     def __hash__(self):
-        return hash(repr(self))
+        return self._hash
+
+
+MAX_CONCURRENT_DOWNLOADS = 4
+MAX_IN_MEMORY_DOWNLOAD = 64 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# path of nxm:// urls, e.g. /mods/387/files/1535
+NXM_PATH_REGEX = re.compile(r"/mods/(\d+)/files/(\d+)")
+
+
+class _SpooledDownload(tempfile.SpooledTemporaryFile):
+    """a SpooledTemporaryFile that zipfile can read from.
+    zipfile needs seekable(), which SpooledTemporaryFile only has since python 3.11"""
+
+    def seekable(self):
+        # both the in-memory and the on-disk file are seekable
+        return True
+
+
+def _async_client():
+    return httpx.AsyncClient(
+        http2=True, timeout=30.0, limits=httpx.Limits(max_connections=32)
+    )
 
 
 ths_namespace, _, ths_name = cfg["Thunderstore"]["BepInEx_Package"].partition("/")
@@ -57,26 +100,79 @@ KEY_BEPINEX_PACK = ModKey(
 )
 
 
-@dataclass
+def _find_files(root: Path, name: str):
+    """yield the paths of all files called name below root, as strings.
+    like root.rglob(name) but using the cached file type info of os.scandir"""
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        subdirs = []
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name == name and entry.is_file():
+                    yield entry.path
+        # reversed, so that folders are visited in scandir order like rglob does.
+        # mods are listed in the order they are found
+        stack.extend(reversed(subdirs))
+
+
+def _thunderstore_download_link(key: ModKey, version: str) -> str:
+    return (
+        f"https://{ths.THUNDERSTORE_HOST}/package/download/"
+        f"{key.ths_namespace}/{key.ths_name}/{version}/"
+    )
+
+
+# characters that ZipFile.extract replaces with "_" on windows
+_WINDOWS_ILLEGAL_NAME_CHARS = str.maketrans(':<>|"?*', "_" * 7)
+
+
+def _zip_member_path(filename: str) -> Path:
+    """the path, relative to the target folder, that ZipFile.extract writes
+    a member with the given filename to"""
+    # mirrors the private ZipFile._extract_member and _sanitize_windows_name,
+    # as of cpython 3.11. _install_mod checks that the results exist on disk
+    arcname = filename.replace("/", os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid_parts = ("", os.path.curdir, os.path.pardir)
+    parts = [x for x in arcname.split(os.path.sep) if x not in invalid_parts]
+    if os.path.sep == "\\":
+        # like ZipFile._sanitize_windows_name: illegal characters become "_",
+        # trailing dots are stripped and parts left empty are dropped
+        parts = [x.translate(_WINDOWS_ILLEGAL_NAME_CHARS).rstrip(".") for x in parts]
+        parts = [x for x in parts if x]
+    return Path(*parts)
+
+
+@dataclass(**_slots)
 class ThunderstoreModInstallState:
     namespace: str
     name: str
 
 
-@dataclass
+@dataclass(**_slots)
 class NexusModInstallState:
     nxm_id: int
 
 
-@dataclass
+@dataclass(**_slots)
 class ModInstallState:
     title: str
     version: str
     ts: int
-    files: Set[Path]
+    # paths relative to the game directory
+    files: Set[str]
     nxm_state: Optional[NexusModInstallState] = None
     ths_state: Optional[ThunderstoreModInstallState] = None
-    _version: int = 1
+    # 2: thunderstore timestamps are read as UTC
+    _version: int = 2
 
     @property
     def mod_type(self):
@@ -98,25 +194,78 @@ class ModInstallState:
         raise ValueError("Invalid mod state")
 
 
-@dataclass
+@dataclass(**_slots)
 class InstallState:
     app_version: Tuple[int, int, int]
 
 
-state_schema = mmd.class_schema(InstallState, base_schema=BaseSchema)()
-mod_state_schema = mmd.class_schema(ModInstallState, base_schema=BaseSchema)()
-
-
-@dataclass
+def load_mod_state(d: dict) -> ModInstallState:
+    """build a ModInstallState from a manifest dict"""
+    nxm_state = d.get("nxm_state")
+    ths_state = d.get("ths_state")
+    ts = d["ts"]
+    version = d.get("_version", 1)
+    if version < 2:
+        if ths_state:
+            # thunderstore dates used to be converted as if they were local time.
+            # left as they are, they would not compare equal to the api ones
+            ts = local_date_ts_to_utc(ts)
+        version = 2
+    return ModInstallState(
+        d["title"],
+        d["version"],
+        ts,
+        set(d["files"]),
+        nxm_state=NexusModInstallState(**nxm_state) if nxm_state else None,
+        ths_state=ThunderstoreModInstallState(**ths_state) if ths_state else None,
+        _version=version,
+    )
+
+
+def dump_mod_state(state: ModInstallState) -> dict:
+    """the inverse of load_mod_state"""
+    return {
+        "title": state.title,
+        "version": state.version,
+        "ts": state.ts,
+        "files": sorted(state.files),
+        "nxm_state": (
+            {"nxm_id": state.nxm_state.nxm_id} if state.nxm_state is not None else None
+        ),
+        "ths_state": (
+            {"namespace": state.ths_state.namespace, "name": state.ths_state.name}
+            if state.ths_state is not None
+            else None
+        ),
+        "_version": state._version,
+    }
+
+
+@dataclass(**_slots)
 class ModItem:
     state: ModInstallState
     disabled: bool
     available_ts: Optional[int] = None
     available_version: Optional[str] = None
+    status: VersionStatus = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._update_status()
 
     def set_available_version(self, ts: int, version: str):
         self.available_ts = ts
         self.available_version = version
+        self._update_status()
+
+    def _update_status(self):
+        if self.available_ts is None:
+            self.status = VersionStatus.Unknown
+        elif self.available_ts > self.state.ts:
+            self.status = VersionStatus.NewerAvailable
+        elif self.available_ts < self.state.ts:
+            self.status = VersionStatus.InstalledIsNewer
+        else:
+            self.status = VersionStatus.Newest
 
 
 class InstallManager:
@@ -131,6 +280,11 @@ class InstallManager:
         # self.state = self._load_state()
         self.state = {}
         self.installed_mods: List[ModItem] = []
+        # relative paths of all installed files and their parent folders,
+        # built on demand. set to None whenever installed files change
+        self._installed_paths: Optional[Set[str]] = None
+        self._basedir_enabled = self.dir / "BepInEx"
+        self._basedir_disabled = self.dir / "BepInEx_vaelstrom_disabled"
 
     def find_installed_mods(self):
         logging.info("Loading installed mods")
@@ -139,23 +293,24 @@ class InstallManager:
 
     def _get_basedir(self, disabled: bool):
         if disabled:
-            return self.dir / "BepInEx_vaelstrom_disabled"
+            return self._basedir_disabled
         else:
-            return self.dir / "BepInEx"
+            return self._basedir_enabled
 
     def _find_installed_mods_in_folder(self, basedir: Path, disabled: bool):
-        for file in basedir.rglob("vaelstrom_manifest.json"):
-            with file.open("r") as f:
-                read_json = json.load(f)
-            state: ModInstallState = mod_state_schema.load(read_json)  # type: ignore
+        for file in _find_files(basedir, "vaelstrom_manifest.json"):
+            with open(file, "rb") as f:
+                read_json = orjson.loads(f.read())
+            state = load_mod_state(read_json)
             # add manifest file so that it will also be deleted when uninstalling this mod
-            state.files.add(file.relative_to(self.dir))
+            state.files.add(os.path.relpath(file, self.dir))
             item = ModItem(state, disabled)
             # bepinex pack shall be at the top
             if state.mod_key() == KEY_BEPINEX_PACK:
                 self.installed_mods.insert(0, item)
             else:
                 self.installed_mods.append(item)
+        self._installed_paths = None
 
     def handle_url(self, url_str: str):
         logging.debug(f"Received URL: {url_str}")
@@ -168,12 +323,12 @@ class InstallManager:
             raise ValueError("received unsupported url")
 
     def _handle_url_nexus(self, url: ParseResult):
-        if url.netloc != cfg["NexusMods"]["GameName"]:
-            raise ValueError(f'Not a {cfg["NexusMods"]["GameName"]} mod')
+        if url.netloc != nm.NEXUS_MODS_GAME:
+            raise ValueError(f"Not a {nm.NEXUS_MODS_GAME} mod")
         qs = dict(parse_qsl(url.query))
         if "key" not in qs or "expires" not in qs:
             raise ValueError("missing `key` or `expires` param from received url")
-        m = re.match(r"/mods/(\d+)/files/(\d+)", url.path)
+        m = NXM_PATH_REGEX.match(url.path)
         if m is None:
             raise ValueError("could not find mod_id and file_id in received url")
         # notification(f"Downloading new mod")
@@ -182,14 +337,7 @@ class InstallManager:
         res = nm.mod_dl_link(mod_id, file_id, qs["key"], qs["expires"])
         dl_link = res[0]["URI"]
         key = ModKey(ModType.NexusMod, nxm_id=mod_id)
-        is_update = False
-        for info in self.installed_mods:
-            if info.state.mod_key() == key:
-                is_update = True
-                # TODO: only uninstall after download succeeded
-                logging.debug("Mod already installed, uninstalling old version first")
-                self.uninstall_mod(key, info)
-                break
+        is_update = self._uninstall_if_installed(key)
         mod_item = self._download_and_install(key, dl_link, file_id)
         if is_update:
             logging.info(f"Updated {mod_item.state.title}")
@@ -198,12 +346,13 @@ class InstallManager:
 
     def _handle_url_thunderstore(self, url: ParseResult):
         # ror2mm://v1/install/valheim.thunderstore.io/denikson/BepInExPack_Valheim/5.4.1001/
-        parts = url.path.strip("/").split("/")
+        # one split more than needed tells apart urls with extra parts
+        parts = url.path.strip("/").split("/", 5)
         if (
             url.netloc != "v1"
             or len(parts) != 5
             or parts[0] != "install"
-            or parts[1] != cfg["Thunderstore"]["GameName"] + ".thunderstore.io"
+            or parts[1] != ths.THUNDERSTORE_HOST
         ):
             return ValueError("Unsupported Thunderstore URL format")
         namespace, name, version = parts[2:5]
@@ -222,15 +371,56 @@ class InstallManager:
                     f"Not updating {mod_item.state.title}. Same or newer version already installed."
                 )
             else:
-                logging.info(
-                    f"Opening Nexusmods download page for {mod_item.state.title}"
-                )
-                # TODO: make use of premium-only direct download api
-                url = nm.get_download_page_url(key.nxm_id, res["file_id"])
-                webbrowser.open(url)
+                self._open_nexus_download_page(mod_item, res["file_id"])
         elif key.type == ModType.Thunderstore:
             self._do_install_thunderstore(key, force_update=force)
 
+    def update_mods(self, mod_items: List[ModItem], force=False):
+        """like update_mod for each of the given mods, but checks all of them
+        at once and downloads the thunderstore updates concurrently.
+        continues with the remaining mods if one of them fails"""
+        results = self._check_for_updates(mod_items)
+        failed = 0
+        updated_items = []
+        downloads = []
+        for item, res in zip(mod_items, results):
+            if isinstance(res, Exception):
+                failed += 1
+                continue
+            if res is None:
+                continue
+            if not force and item.available_ts <= item.state.ts:
+                logging.info(
+                    f"Not updating {item.state.title}. Same or newer version already installed."
+                )
+                continue
+            key = item.state.mod_key()
+            if key.type == ModType.NexusMod:
+                self._open_nexus_download_page(item, res["file_id"])
+            else:
+                updated_items.append(item)
+                downloads.append(
+                    (
+                        key,
+                        _thunderstore_download_link(key, item.available_version),
+                        item.available_ts,
+                    )
+                )
+        for item, res in zip(updated_items, self.install_many(downloads)):
+            if isinstance(res, Exception):
+                logging.error(f"Failed to update {item.state.title}: {res!r}")
+                failed += 1
+            else:
+                logging.info(f"Updated {res.state.title}")
+        if failed:
+            raise RuntimeError(f"Failed to update {failed} of {len(mod_items)} mods")
+
+    def _open_nexus_download_page(self, mod_item: ModItem, file_id: int):
+        logging.info(f"Opening Nexusmods download page for {mod_item.state.title}")
+        # TODO: make use of premium-only direct download api
+        url = nm.get_download_page_url(mod_item.state.nxm_state.nxm_id, file_id)
+        webbrowser.open(url)
+
     def _do_install_thunderstore(
         self, key: ModKey, version: Optional[str] = None, force_update=False
     ):
@@ -259,10 +449,7 @@ class InstallManager:
             ts = thunderstore_date_to_ts(res["latest"]["date_created"])
         else:
             ts = thunderstore_date_to_ts(res["date_created"])
-        dl_link = (
-            f'https://{cfg["Thunderstore"]["GameName"]}.thunderstore.io/package/download/'
-            f"{key.ths_namespace}/{key.ths_name}/{version}/"
-        )
+        dl_link = _thunderstore_download_link(key, version)
         mod_item = self._download_and_install(key, dl_link, ts)
 
         if is_update:
@@ -274,6 +461,15 @@ class InstallManager:
         if mod_items is None:
             logging.debug("Checking for updates on all installed mods")
             mod_items = self.installed_mods
+        results = self._check_for_updates(mod_items)
+        failed = sum(isinstance(res, Exception) for res in results)
+        if failed:
+            raise RuntimeError(f"Failed to check {failed} of {len(mod_items)} mods")
+
+    def _check_for_updates(self, mod_items: List[ModItem]) -> list:
+        """check the given mods concurrently and set their available versions.
+        returns the api result for each mod, with failed checks as exceptions
+        and None for mods that can't be checked"""
         nxm_ids = []
         name_tuples = []
         for item in mod_items:
@@ -289,47 +485,59 @@ class InstallManager:
 
         idx_nxm = 0
         idx_ths = 0
+        results = []
         for item in mod_items:
             if item.state.nxm_state is not None:
                 res = ress_nxm[idx_nxm]
-                item.set_available_version(res["uploaded_timestamp"], res["version"])
                 idx_nxm += 1
             elif item.state.ths_state is not None:
                 res = ress_ths[idx_ths]
+                idx_ths += 1
+            else:
+                res = None
+            results.append(res)
+            if res is None:
+                continue
+            # failed requests don't prevent updating the other mods
+            if isinstance(res, Exception):
+                logging.error(f"Failed to check {item.state.title}: {res!r}")
+            elif item.state.nxm_state is not None:
+                item.set_available_version(res["uploaded_timestamp"], res["version"])
+            else:
                 item.set_available_version(
                     thunderstore_date_to_ts(res["latest"]["date_created"]),
                     res["latest"]["version_number"],
                 )
-                idx_ths += 1
+        return results
 
     async def _updatecheck_helper_async(
         self, nxm_ids: List[int], name_tuples: List[Tuple[str, str]]
     ):
-        return await asyncio.gather(
-            nm.mod_file_info_newest_multiple(nxm_ids),
-            ths.package_info_multiple(name_tuples),
-        )
+        # one client for all requests, so that connections are shared
+        # and requests to the same host are multiplexed over http/2
+        async with _async_client() as session:
+            return await asyncio.gather(
+                nm.mod_file_info_newest_multiple(session, nxm_ids),
+                ths.package_info_multiple(session, name_tuples),
+            )
 
     def _load_state(self) -> InstallState:
         file = self._get_state_file_path()
         logging.debug(f"Loading state from {str(file)}")
         try:
-            with file.open("r") as f:
-                read_json = json.load(f)
+            read_json = orjson.loads(file.read_bytes())
         except FileNotFoundError:
             logging.info(
                 f"Could not find state file at {str(file)}. Initializing empty state"
             )
             return InstallState(app_version=(0, 0, 1))
-        return state_schema.load(read_json)  # type: ignore
+        return InstallState(app_version=tuple(read_json["app_version"]))
 
     def _save_state(self):
         file = self._get_state_file_path()
         logging.debug(f"Saving state to {str(file)}")
-        state_dict = state_schema.dump(self.state)
-        text = json.dumps(state_dict, cls=SetEncoder, indent=2)
-        with self._get_state_file_path().open("w") as f:
-            f.write(text)
+        # orjson serializes dataclasses by itself
+        file.write_bytes(orjson.dumps(self.state, option=orjson.OPT_INDENT_2))
 
     def _save_mod_state(self, key: ModKey, mod_state: ModInstallState):
         """Saves the given mod state into a manifest file inside the mod's installation folder. Returns path to the newly-created manifest file."""
@@ -339,10 +547,8 @@ class InstallManager:
             outdir = self._get_mod_install_path(key)
         outfile = outdir / Path("vaelstrom_manifest.json")
         logging.debug(f"Saving mod state to {str(outfile)}")
-        state_dict = mod_state_schema.dump(mod_state)
-        text = json.dumps(state_dict, cls=SetEncoder, indent=2)
-        with outfile.open("w") as f:
-            f.write(text)
+        state_dict = dump_mod_state(mod_state)
+        outfile.write_bytes(orjson.dumps(state_dict, option=orjson.OPT_INDENT_2))
         return outfile
 
     def _get_state_file_path(self) -> Path:
@@ -350,26 +556,30 @@ class InstallManager:
 
     def uninstall_mod(self, key: ModKey, mod_item: ModItem):
         mod_install_path = self._get_mod_install_path(key)
+        # folders to delete if empty, relative to mod_install_path.
+        # each one is in here together with all of its parents
+        dirs: Set[Path] = set()
         for rp in mod_item.state.files:
             p = self.dir / rp
+            rp = p.relative_to(mod_install_path)
             if p.is_file():
                 p.unlink(missing_ok=True)
-            else:
-                try:
-                    p.rmdir()
-                except OSError:
-                    # TODO: only ignore "directory not empty", not any type of OSError
-                    pass
-
-            # delete parents if empty
-            rp = p.relative_to(mod_install_path)
-            for dir in rp.parents:
-                try:
-                    (mod_install_path / dir).rmdir()
-                except OSError:
-                    # TODO: only ignore "directory not empty", not any type of OSError
-                    pass
+                rp = rp.parent
+            for dir in (rp, *rp.parents):
+                if dir in dirs:
+                    # so are its parents
+                    break
+                dirs.add(dir)
+
+        # children before their parents
+        for dir in sorted(dirs, key=lambda d: len(d.parts), reverse=True):
+            try:
+                os.rmdir(mod_install_path / dir)
+            except OSError:
+                # TODO: only ignore "directory not empty", not any type of OSError
+                pass
         self.installed_mods.remove(mod_item)
+        self._installed_paths = None
 
     def disable_mod(self, mod_item: ModItem):
         if mod_item.disabled:
@@ -401,23 +611,82 @@ class InstallManager:
         # adjust file paths in state json
         files = set()
         for p in mod_item.state.files:
-            files.add(mod_path_target / p.relative_to(mod_path_source))
+            files.add(str(mod_path_target / Path(p).relative_to(mod_path_source)))
         mod_item.state.files = files
+        self._installed_paths = None
         self._save_mod_state(key, mod_item.state)
 
+    def _uninstall_if_installed(self, key: ModKey) -> bool:
+        """uninstall the installed version of the mod, if there is one.
+        returns whether there was one"""
+        for item in self.installed_mods:
+            if item.state.mod_key() == key:
+                # TODO: only uninstall after download succeeded
+                logging.debug("Mod already installed, uninstalling old version first")
+                self.uninstall_mod(key, item)
+                return True
+        return False
+
+    def install_many(self, downloads: List[Tuple[ModKey, str, int]]):
+        """download and install several mods concurrently, replacing installed
+        versions. takes the arguments of _download_and_install for each mod.
+        checking whether an update is wanted is up to the caller.
+        failed installs are returned as exceptions, in place of their ModItem"""
+        for key, _, _ in downloads:
+            self._uninstall_if_installed(key)
+        return asyncio.run(self._install_many_async(downloads))
+
+    async def _install_many_async(self, downloads: List[Tuple[ModKey, str, int]]):
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+        async def install(session, download):
+            async with semaphore:
+                return await self._download_and_install_async(session, *download)
+
+        async with _async_client() as session:
+            return await asyncio.gather(
+                *[install(session, download) for download in downloads],
+                return_exceptions=True,
+            )
+
     def _download_and_install(
         self, key: ModKey, download_link: str, file_id_or_ts: int = 0
     ):
-        tempdir = Path(tempfile.mkdtemp())
+        return asyncio.run(
+            self._download_and_install_standalone(key, download_link, file_id_or_ts)
+        )
+
+    async def _download_and_install_standalone(
+        self, key: ModKey, download_link: str, file_id_or_ts: int = 0
+    ):
+        async with _async_client() as session:
+            return await self._download_and_install_async(
+                session, key, download_link, file_id_or_ts
+            )
+
+    async def _download_and_install_async(
+        self,
+        session: httpx.AsyncClient,
+        key: ModKey,
+        download_link: str,
+        file_id_or_ts: int = 0,
+    ):
         url = urlparse(download_link)
         if url.scheme != "https":
             raise ValueError("download link does not use https")
-        mod_zip = tempdir / Path(str(key) + ".zip")
-        with httpx.stream("GET", download_link, follow_redirects=True) as r:
-            r.raise_for_status()
-            with mod_zip.open("wb") as f:
-                for chunk in r.iter_bytes(chunk_size=8192):
-                    f.write(chunk)
+        # small mods stay in memory, larger ones spill to disk
+        with _SpooledDownload(max_size=MAX_IN_MEMORY_DOWNLOAD) as mod_zip:
+            async with session.stream("GET", download_link, follow_redirects=True) as r:
+                r.raise_for_status()
+                async for chunk in r.aiter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    mod_zip.write(chunk)
+            mod_zip.seek(0)
+            # the rest is synchronous, so concurrent installs don't interleave here
+            return self._install_downloaded(url, key, mod_zip, file_id_or_ts)
+
+    def _install_downloaded(
+        self, url: ParseResult, key: ModKey, mod_zip: BinaryIO, file_id_or_ts: int
+    ):
         if key.type == ModType.NexusMod:
             res = nm.mod_file_info(key.nxm_id, file_id_or_ts)
             ts = int(res["uploaded_timestamp"])
@@ -444,13 +713,14 @@ class InstallManager:
             raise ValueError("Unsupported mod type")
 
         manifest = self._save_mod_state(key, mod_state)
-        mod_state.files.add(manifest.relative_to(self.dir))
+        mod_state.files.add(str(manifest.relative_to(self.dir)))
         # bepinex pack shall be at the top
         mod_item = ModItem(mod_state, False, ts, version)
         if mod_state.mod_key() == KEY_BEPINEX_PACK:
             self.installed_mods.insert(0, mod_item)
         else:
             self.installed_mods.append(mod_item)
+        self._installed_paths = None
         return mod_item
 
     def _get_mod_install_path(self, key: ModKey, disabled: bool = False):
@@ -466,12 +736,7 @@ class InstallManager:
 
         return self._get_basedir(disabled) / "plugins" / folder
 
-    def _install_mod(self, mod_zip: Path, key: ModKey) -> Set[Path]:
-        files = set()
-
-        if not zf.is_zipfile(mod_zip):
-            raise ValueError("Not a zipfile:", str(mod_zip))
-
+    def _install_mod(self, mod_zip: BinaryIO, key: ModKey) -> Set[str]:
         # (if no dll, stop) (TODO)
         # if is bepinex pack, only extract BepInExPack_Valheim/ to game root
         # if BepInEx/plugins, only extract contents of that
@@ -483,7 +748,13 @@ class InstallManager:
 
         mod_install_path = self._get_mod_install_path(key)
 
-        with zf.ZipFile(mod_zip) as myzip:
+        # opening it reads the central directory once, is_zipfile would read it twice
+        try:
+            myzip = zf.ZipFile(mod_zip)
+        except zf.BadZipFile:
+            raise ValueError("Not a zipfile:", str(key))
+
+        with myzip:
             prefix = None
             if key == KEY_BEPINEX_PACK:
                 prefix = KEY_BEPINEX_PACK.ths_name
@@ -492,32 +763,35 @@ class InstallManager:
                 #     if name.startswith(prefix):
                 #         error = False
                 #         break
+            all_infos = myzip.infolist()
             if not prefix:
-                for name in myzip.namelist():
-                    if name.startswith("BepInEx/plugins/"):
+                # BepInEx/plugins/ wins over plugins/, wherever they appear
+                for info in all_infos:
+                    if info.filename.startswith("BepInEx/plugins/"):
                         prefix = "BepInEx/plugins/"
                         break
-            if not prefix:
-                for name in myzip.namelist():
-                    if name.startswith("plugins/"):
+                    elif prefix is None and info.filename.startswith("plugins/"):
                         prefix = "plugins/"
-                        break
             if prefix:
-                for info in myzip.infolist():
+                infos = []
+                for info in all_infos:
                     if info.filename.startswith(prefix) and not info.filename == prefix:
                         info.filename = info.filename[len(prefix) :]
-                        files.add(
-                            Path(
-                                myzip.extract(info, path=mod_install_path)
-                            ).relative_to(self.dir)
-                        )
+                        infos.append(info)
             else:
-                for info in myzip.infolist():
-                    files.add(
-                        Path(myzip.extract(info, path=mod_install_path)).relative_to(
-                            self.dir
-                        )
-                    )
+                infos = all_infos
+            # folders are recorded too, so that uninstalling removes them
+            relpath = mod_install_path.relative_to(self.dir)
+            files = {str(relpath / _zip_member_path(info.filename)) for info in infos}
+            myzip.extractall(path=mod_install_path, members=infos)
+
+        # in case zipfile changes how it names extracted files
+        missing = [f for f in files if not (self.dir / f).exists()]
+        if missing:
+            logging.error(
+                "Some extracted files are not where they were expected, "
+                f"uninstalling will leave them behind: {sorted(missing)}"
+            )
 
         if len(files) == 0:
             logging.error(
@@ -537,13 +811,23 @@ class InstallManager:
                 f"{str(path)}"
             )
         else:
-            for mod_info in self.installed_mods:
-                for entry in mod_info.state.files:
-                    # TODO: is there a better way? except is_relative_to from py 3.9
-                    if str(entry).startswith(str(relpath)):
-                        return True
+            if self._installed_paths is None:
+                self._installed_paths = self._collect_installed_paths()
+            return str(relpath) in self._installed_paths
         return False
 
+    def _collect_installed_paths(self) -> Set[str]:
+        """a path belongs to a mod install if it is one of the installed files
+        or a folder containing one of them"""
+        paths = set()
+        for mod_info in self.installed_mods:
+            for entry in mod_info.state.files:
+                paths.add(entry)
+                paths.update(str(parent) for parent in Path(entry).parents)
+        # every relative path has "." as its last parent
+        paths.discard(".")
+        return paths
+
     def discover_existing_mods(self) -> List[ModInstallState]:
         # TODO: this is WIP
         # TODO: move discovered mods directly to nexusmod_<id> folder
@@ -552,29 +836,18 @@ class InstallManager:
         # (there is not much sense in listing a mod if we can't update it)
 
         discovered_mods = []
+        dll_paths: List[Path] = []
         for p in (self.dir / Path("BepInEx/plugins/")).iterdir():
             files = set()
             mod_id = None
-            mod_name = None
-            mod_version = None
             if p.is_file() and p.suffix == ".dll":
                 logging.debug(f"Discovered dll: {str(p)}")
                 if self._path_belongs_to_mod_install(p):
                     logging.debug(
                         "Discovered dll already belongs to mod install, skipping"
                     )
-                elif dll_info := find_plugin_info(str(p)):
-                    logging.debug(f"Discovered info in dll: {dll_info} in {str(p)}")
-                    mod_name = dll_info["title"]
-                    mod_version = dll_info["version"]
-                    # files = {p.relative_to(self.dir)}
-                    discovered_mods.append(
-                        ModInstallState(
-                            mod_name, mod_version, 0, {p.relative_to(self.dir)}
-                        )
-                    )
                 else:
-                    logging.debug("No info discovered in dll, skipping")
+                    dll_paths.append(p)
 
             # find dangling nexusmod_<id> folders
             # if p.is_dir():
@@ -600,8 +873,33 @@ class InstallManager:
             #         files=files,
             #     )
 
+        for p, dll_info in zip(dll_paths, self._find_plugin_infos(dll_paths)):
+            if dll_info:
+                logging.debug(f"Discovered info in dll: {dll_info} in {str(p)}")
+                mod_name = dll_info["title"]
+                mod_version = dll_info["version"]
+                # files = {p.relative_to(self.dir)}
+                discovered_mods.append(
+                    ModInstallState(
+                        mod_name, mod_version, 0, {str(p.relative_to(self.dir))}
+                    )
+                )
+            else:
+                logging.debug(f"No info discovered in dll, skipping: {str(p)}")
+
         # TODO: make persistent? create manifest.json or add to state.json?
         for mod in discovered_mods:
             self.installed_mods.append(mod)
+        self._installed_paths = None
 
         return discovered_mods
+
+    def _find_plugin_infos(self, dll_paths: List[Path]) -> List[Optional[dict]]:
+        """run find_plugin_info on each dll, in separate processes if there are
+        several. the scans are cpu-bound, so threads would not help (GIL)"""
+        if len(dll_paths) <= 1:
+            return [find_plugin_info(str(p)) for p in dll_paths]
+        with ProcessPoolExecutor() as executor:
+            return list(
+                executor.map(find_plugin_info, [str(p) for p in dll_paths], chunksize=4)
+            )
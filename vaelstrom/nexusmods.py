@@ -1,34 +1,47 @@
 import httpx as rq
 import asyncio
+from operator import itemgetter
 from typing import List
 from pathlib import Path
-import json
+import orjson
 import logging
 
 from vaelstrom import cfg
+from vaelstrom.util import api_client, get_validated, memoize_immutable
 
 NEXUS_MODS_URL = "https://api.nexusmods.com/"
 # TODO: don't cache the config like this?
 NEXUS_MODS_GAME = cfg["NexusMods"]["GameName"]
+NEXUS_MODS_API_KEY = cfg["NexusMods"]["APIKey"]
+USE_API_CACHE = cfg["NexusMods"].getboolean("UseAPICache")
+SAVE_API_RESULTS = cfg["NexusMods"].getboolean("SaveAPIResults")
+API_RESULTS_FOLDER = Path(cfg["NexusMods"]["SaveAPIResultsFolder"])
 
+_client = api_client(base_url=NEXUS_MODS_URL, headers={"apikey": NEXUS_MODS_API_KEY})
 
-def _rq(method: str, endpoint: str, **kwargs):
-    kwargs.setdefault("headers", {})["apikey"] = cfg["NexusMods"]["APIKey"]
-    p = Path(cfg["NexusMods"]["SaveAPIResultsFolder"]) / Path(endpoint)
 
-    if cfg["NexusMods"].getboolean("UseAPICache"):
+def _rq(method: str, endpoint: str, raise_for_status=False, **kwargs):
+    if USE_API_CACHE or SAVE_API_RESULTS:
+        p = API_RESULTS_FOLDER / Path(endpoint)
+
+    if USE_API_CACHE:
         if p.exists():
-            with p.open("r") as f:
-                return json.load(f)
+            return orjson.loads(p.read_bytes())
+
+    res = _client.request(method, endpoint, **kwargs)
+    if raise_for_status:
+        res.raise_for_status()
 
-    res = rq.request(method, NEXUS_MODS_URL + endpoint, **kwargs)
+    data = orjson.loads(res.content)
 
-    if cfg["NexusMods"].getboolean("SaveAPIResults"):
+    if SAVE_API_RESULTS:
         p.parent.mkdir(parents=True, exist_ok=True)
-        with p.open("w") as f:
-            json.dump(res.json(), f, indent=2)
+        p.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+
+    return data
+
 
-    return res.json()
+_rq_immutable = memoize_immutable(_rq)
 
 
 def mod_file_list(mod_id: int):
@@ -43,7 +56,8 @@ def mod_info(mod_id: int):
 
 def mod_file_info(mod_id: int, file_id: int):
     url = f"v1/games/{NEXUS_MODS_GAME}/mods/{mod_id}/files/{file_id}.json"
-    return _rq("GET", url)
+    # an uploaded file doesn't change
+    return _rq_immutable(url)
 
 
 def mod_dl_link(mod_id: int, file_id: int, key: str, expires: str):
@@ -59,39 +73,34 @@ def get_download_page_url(mod_id: int, file_id: int):
     return f"https://www.nexusmods.com/{NEXUS_MODS_GAME}/mods/{mod_id}/?tab=files&file_id={file_id}&nmm=1"
 
 
-def mod_file_info_newest(mod_id: int):
-    res = mod_file_list(mod_id)
-    if len(res["files"]) == 0:
+def _newest_file(files: list):
+    if len(files) == 0:
         raise ValueError("mod has no files")
-    newest = res["files"][-1]
     # TODO: is this needed? maybe we can rely on the last one being the newest one
     # TODO: need to check is_primary / category, e.g. for ImprovedBuildHud
-    for file in res["files"]:
-        if file["uploaded_timestamp"] > newest["uploaded_timestamp"]:
-            newest = file
+    # the last one listed wins a tie with the newest, otherwise the first newest
+    newest = max(files, key=itemgetter("uploaded_timestamp"))
+    if files[-1]["uploaded_timestamp"] == newest["uploaded_timestamp"]:
+        return files[-1]
     return newest
 
 
-async def mod_file_info_newest_multiple(mod_ids: List[int]):
-    async with rq.AsyncClient() as session:
-        ress = await asyncio.gather(
-            *[mod_file_info_newest_async(session, mod_id) for mod_id in mod_ids]
-        )
-    return ress
+def mod_file_info_newest(mod_id: int):
+    res = mod_file_list(mod_id)
+    return _newest_file(res["files"])
+
+
+async def mod_file_info_newest_multiple(session: rq.AsyncClient, mod_ids: List[int]):
+    """failed requests are returned as exceptions, in place of their result"""
+    return await asyncio.gather(
+        *[mod_file_info_newest_async(session, mod_id) for mod_id in mod_ids],
+        return_exceptions=True,
+    )
 
 
 async def mod_file_info_newest_async(session, mod_id: int):
     url = f"v1/games/{NEXUS_MODS_GAME}/mods/{mod_id}/files.json"
-    res = await session.get(
-        NEXUS_MODS_URL + url, headers={"apikey": cfg["NexusMods"]["APIKey"]}
+    res = await get_validated(
+        session, NEXUS_MODS_URL + url, headers={"apikey": NEXUS_MODS_API_KEY}
     )
-    res = res.json()
-    if len(res["files"]) == 0:
-        raise ValueError("mod has no files")
-    newest = res["files"][-1]
-    # TODO: is this needed? maybe we can rely on the last one being the newest one
-    # TODO: need to check is_primary / category, e.g. for ImprovedBuildHud
-    for file in res["files"]:
-        if file["uploaded_timestamp"] > newest["uploaded_timestamp"]:
-            newest = file
-    return newest
+    return _newest_file(res["files"])
@@ -2,52 +2,69 @@ import asyncio
 from typing import List, Optional, Tuple
 import httpx as rq
 from pathlib import Path
-import json
+import orjson
 
 from vaelstrom import cfg
+from vaelstrom.util import api_client, get_validated, memoize_immutable
 
 
-THUNDERSTORE_URL = f'https://{cfg["Thunderstore"]["GameName"]}.thunderstore.io/api/'
+THUNDERSTORE_HOST = f'{cfg["Thunderstore"]["GameName"]}.thunderstore.io'
+THUNDERSTORE_URL = f"https://{THUNDERSTORE_HOST}/api/"
+USE_API_CACHE = cfg["Thunderstore"].getboolean("UseAPICache")
+SAVE_API_RESULTS = cfg["Thunderstore"].getboolean("SaveAPIResults")
+API_RESULTS_FOLDER = Path(cfg["Thunderstore"]["SaveAPIResultsFolder"])
 
+_client = api_client(base_url=THUNDERSTORE_URL)
 
-def _rq(method: str, endpoint: str, **kwargs):
-    p = Path(cfg["Thunderstore"]["SaveAPIResultsFolder"]) / Path(endpoint)
-    if p.suffix != ".json":
-        p = p.parent / (p.name + ".json")
 
-    if cfg["Thunderstore"].getboolean("UseAPICache"):
+def _rq(method: str, endpoint: str, raise_for_status=False, **kwargs):
+    if USE_API_CACHE or SAVE_API_RESULTS:
+        p = API_RESULTS_FOLDER / Path(endpoint)
+        if p.suffix != ".json":
+            p = p.parent / (p.name + ".json")
+
+    if USE_API_CACHE:
         if p.exists():
-            with p.open("r") as f:
-                return json.load(f)
+            return orjson.loads(p.read_bytes())
+
+    res = _client.request(method, endpoint, **kwargs)
+    if raise_for_status:
+        res.raise_for_status()
 
-    res = rq.request(method, THUNDERSTORE_URL + endpoint, **kwargs)
+    data = orjson.loads(res.content)
 
-    if cfg["Thunderstore"].getboolean("SaveAPIResults"):
+    if SAVE_API_RESULTS:
         p.parent.mkdir(parents=True, exist_ok=True)
-        with p.open("w") as f:
-            json.dump(res.json(), f, indent=2)
+        p.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+
+    return data
 
-    return res.json()
+
+_rq_immutable = memoize_immutable(_rq)
 
 
 def package_info(namespace: str, name: str, version: Optional[str] = None):
     url = f"experimental/package/{namespace}/{name}/"
     if version is not None:
         url += f"{version}/"
+        # a released version doesn't change
+        return _rq_immutable(url)
     return _rq("GET", url)
 
 
 async def package_info_async(session, namespace: str, name: str):
     url = f"experimental/package/{namespace}/{name}/"
-    res = await session.get(THUNDERSTORE_URL + url)
-    return res.json()
-
-
-async def package_info_multiple(name_tuples: List[Tuple[str, str]]):
-    async with rq.AsyncClient() as session:
-        return await asyncio.gather(
-            *[
-                package_info_async(session, namespace, name)
-                for (namespace, name) in name_tuples
-            ]
-        )
+    return await get_validated(session, THUNDERSTORE_URL + url)
+
+
+async def package_info_multiple(
+    session: rq.AsyncClient, name_tuples: List[Tuple[str, str]]
+):
+    """failed requests are returned as exceptions, in place of their result"""
+    return await asyncio.gather(
+        *[
+            package_info_async(session, namespace, name)
+            for (namespace, name) in name_tuples
+        ],
+        return_exceptions=True,
+    )
@@ -1,85 +1,206 @@
+import atexit
+from bisect import bisect_right
+import calendar
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 import logging
+import math
+import sys
+import time as _time  # pretty_date's time parameter would shadow the module
 
-# TODO: only import on windows
-import winreg
+import httpx
+import orjson
 
+if sys.platform == "win32":
+    import winreg
 
+STEAM_UNINSTALL_SUBKEY = (
+    r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall\Steam App {appid}"
+)
+
+
+@lru_cache(maxsize=None)
 def find_steam_install_path(appid: str) -> Optional[Path]:
-    """Query the Windows Registry to find the Steam Valheim installation directory"""
+    """Query the Windows Registry to find the Steam Valheim installation directory.
+    The result is cached, the directory doesn't move while we are running"""
+    if sys.platform != "win32":
+        logging.warning("Not on Windows, cannot look up Valheim directory.")
+        return None
     logging.debug("Looking for Valheim directory in Windows Registry")
-    registry = winreg.ConnectRegistry(None, winreg.HKEY_LOCAL_MACHINE)
     try:
-        key = winreg.OpenKey(
-            registry,
-            r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall\Steam App "
-            + str(appid),
+        # the predefined handle works directly for the local machine
+        with winreg.OpenKey(
+            winreg.HKEY_LOCAL_MACHINE,
+            STEAM_UNINSTALL_SUBKEY.format(appid=appid),
             access=winreg.KEY_READ | winreg.KEY_WOW64_64KEY,
-        )
-        (value, type) = winreg.QueryValueEx(key, "InstallLocation")
-        if type == winreg.REG_SZ:
-            logging.info(f"Discovered Valheim directory: {str(value)}")
-            return Path(value)
+        ) as key:
+            # steam always writes this as a REG_SZ string
+            value, _ = winreg.QueryValueEx(key, "InstallLocation")
+        logging.info(f"Discovered Valheim directory: {str(value)}")
+        return Path(value)
     except FileNotFoundError:
         logging.warning("Could not find Valheim directory in registry.")
 
 
+def api_client(**kwargs) -> httpx.Client:
+    """a client for all synchronous requests to one api,
+    keeps the connection alive between them. closed at exit"""
+    client = httpx.Client(http2=True, timeout=30.0, **kwargs)
+    atexit.register(client.close)
+    return client
+
+
+def memoize_immutable(rq: Callable[..., Any]) -> Callable[[str], Any]:
+    """turn rq(method, endpoint, raise_for_status) into a function that GETs
+    a resource that never changes, only requested once per session.
+    error responses raise, so that they are not memoized.
+    the result is shared, don't modify it"""
+
+    @lru_cache(maxsize=512)
+    def rq_immutable(endpoint: str):
+        return rq("GET", endpoint, raise_for_status=True)
+
+    return rq_immutable
+
+
+# per url: the validators of the last successful response and its parsed body
+_validated: Dict[str, Tuple[Dict[str, str], Any]] = {}
+
+
+async def get_validated(session: httpx.AsyncClient, url: str, **kwargs):
+    """GET url as a conditional request, if it was requested before.
+    returns the previous result if the server answers 304 Not Modified.
+    the result is shared, don't modify it"""
+    cached = _validated.get(url)
+    if cached is not None:
+        kwargs["headers"] = {**kwargs.get("headers", {}), **cached[0]}
+    res = await session.get(url, **kwargs)
+    if res.status_code == 304 and cached is not None:
+        return cached[1]
+    data = orjson.loads(res.content)
+    if res.is_success:
+        validators = {}
+        if etag := res.headers.get("ETag"):
+            validators["If-None-Match"] = etag
+        if last_modified := res.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = last_modified
+        if validators:
+            _validated[url] = (validators, data)
+    return data
+
+
+# mods often share timestamps, e.g. installed and available version
+@lru_cache(maxsize=4096)
 def ts_to_text(timestamp: Union[int, None]) -> str:
     if timestamp is None:
         return "unknown"
     return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
 
 
+# pretty_date picks the first bucket whose threshold is greater than the age.
+# within the same day, by seconds. round() rounds half to even just like ":.0f",
+# but formatting the resulting int is cheaper than formatting a float
+SECOND_THRESHOLDS = (10, 60, 120, 3600, 7200, 86400)
+SECOND_FORMATS = (
+    lambda s: "just now",
+    lambda s: f"{s} seconds ago",
+    lambda s: "a minute ago",
+    lambda s: f"{round(s / 60)} minutes ago",
+    lambda s: "an hour ago",
+    lambda s: f"{round(s / 3600)} hours ago",
+)
+# from the next day on, by days. the last format has no threshold
+DAY_THRESHOLDS = (2, 7, 31, 365)
+DAY_FORMATS = (
+    lambda d: "Yesterday",
+    lambda d: f"{d} days ago",
+    lambda d: f"{(d / 7):.1f} weeks ago",
+    lambda d: f"{(d / 30):.1f} months ago",
+    lambda d: f"{(d / 365):.1f} years ago",
+)
+
+
+# relative dates only need to be exact to a few seconds. when pretty_date takes
+# the current time itself, rounding it down to a multiple of this many seconds
+# lets repeated calls share cached results
+PRETTY_DATE_RESOLUTION = 10
+
+
+def now_ts() -> int:
+    """the current time as an int epoch timestamp"""
+    return int(_time.time())
+
+
 # based on https://stackoverflow.com/a/1551394
-def pretty_date(time: Union[int, datetime, None]) -> str:
+def pretty_date(time: Union[int, datetime, None], now: Optional[int] = None) -> str:
     """
     Get a datetime object or a int() Epoch timestamp and return a
     pretty string like 'an hour ago', 'Yesterday', '3 months ago',
     'just now', etc
+    Pass now as an int timestamp to format many dates relative to
+    the same point in time, it is used as it is
     """
     if time is None:
         return "unknown"
 
-    from datetime import datetime
+    # from here on everything is in epoch seconds
+    if isinstance(time, datetime):
+        # rounding up keeps the age rounded down to whole seconds
+        time = math.ceil(time.timestamp())
+    elif type(time) is not int:
+        raise TypeError(f"pretty_date: unsupported type {type(time).__name__}")
+    if now is None:
+        now = now_ts()
+        rounded = now - now % PRETTY_DATE_RESOLUTION
+        # relative to the rounded now, newer dates would be in the future
+        if time < rounded:
+            now = rounded
+    return _pretty_date_ts(time, now)
+
 
-    now = datetime.now()
-    if type(time) is int:
-        diff = now - datetime.fromtimestamp(time)
-    elif isinstance(time, datetime):
-        diff = now - time
-    else:
-        diff = now - now
-    second_diff = diff.seconds
-    day_diff = diff.days
+@lru_cache(maxsize=2048)
+def _pretty_date_ts(time: int, now: int) -> str:
+    return _pretty_seconds(now - time)
+
+
+def _pretty_seconds(delta: int) -> str:
+    """format an age given in whole seconds"""
+    day_diff, second_diff = divmod(delta, 86400)
+
+    # most mods were released days to years ago, check for that first
+    if day_diff > 0:
+        return DAY_FORMATS[bisect_right(DAY_THRESHOLDS, day_diff)](day_diff)
 
     if day_diff < 0:
         return ""
 
-    if day_diff == 0:
-        if second_diff < 10:
-            return "just now"
-        if second_diff < 60:
-            return f"{(second_diff):.0f} seconds ago"
-        if second_diff < 120:
-            return "a minute ago"
-        if second_diff < 3600:
-            return f"{(second_diff / 60):.0f} minutes ago"
-        if second_diff < 7200:
-            return "an hour ago"
-        if second_diff < 86400:
-            return f"{(second_diff / 3600):.0f} hours ago"
-    if day_diff == 1:
-        return "Yesterday"
-    if day_diff < 7:
-        return f"{day_diff} days ago"
-    if day_diff < 31:
-        return f"{(day_diff / 7):.1f} weeks ago"
-    if day_diff < 365:
-        return f"{(day_diff / 30):.1f} months ago"
-    return f"{(day_diff / 365):.1f} years ago"
+    return SECOND_FORMATS[bisect_right(SECOND_THRESHOLDS, second_diff)](second_diff)
 
 
+# versions of a package are often checked more than once per session
+@lru_cache(maxsize=16384)
 def thunderstore_date_to_ts(date_string):
-    return int(datetime.strptime(date_string, "%Y-%m-%dT%H:%M:%S.%fZ").timestamp())
+    # fixed format like 2021-03-01T12:00:00.123456Z, slicing is a lot faster
+    # than strptime. the fraction is dropped, it doesn't change the int result.
+    # the date is UTC, so timegm converts it without any timezone lookup
+    return calendar.timegm(
+        (
+            int(date_string[0:4]),
+            int(date_string[5:7]),
+            int(date_string[8:10]),
+            int(date_string[11:13]),
+            int(date_string[14:16]),
+            int(date_string[17:19]),
+            0,
+            0,
+            0,
+        )
+    )
+
+
+def local_date_ts_to_utc(timestamp: int) -> int:
+    """fix a timestamp of a UTC date that was converted as if it was local time,
+    like thunderstore_date_to_ts used to do"""
+    return calendar.timegm(datetime.fromtimestamp(timestamp).timetuple())